@@ -1,42 +1,100 @@
+import mmap
+import os
 import re
 import sys
-from datetime import time, datetime, timedelta
-from typing import Iterator
+import tempfile
+from bisect import bisect_left
+from functools import lru_cache
+from datetime import time
+from typing import Iterable, Iterator
 
-type VttData = list[tuple[time, time, str]]
+# start and end times are kept as microseconds since midnight
+type Subtitle = tuple[int, int, str]
+type VttData = Iterable[Subtitle]
 
+US_PER_SECOND = 1_000_000
+US_PER_DAY = 86_400 * US_PER_SECOND
 
-def add_seconds(t: time, seconds: float) -> time:
-    """Add a number of seconds to a time object.
+SENTENCE_ENDS = ".?!,"
+
+# all patterns are compiled once here, never per call
+# every ISO time starts with a two digit hour (optionally prefixed by T),
+# possibly indented by any whitespace that is not a line break
+_TS_RE = re.compile(r"[^\S\r\n]*T?\d\d")
+# lines in the raw input that might hold a timestamp, including their line
+# end which like in text mode may be \n, \r\n or a bare \r. This is only a
+# loose filter, any non-ASCII byte is let through as possible indentation
+# (such as a UTF-8 no-break space) and str_to_time does the real check.
+_TS_LINE_RE = re.compile(
+    rb"(?<![^\r\n])[ \t\f\v\x1c-\x1f\x80-\xff]*T?\d\d[^\r\n]*(?:\r\n|\r|\n|\Z)"
+)
+_SENT_RE = re.compile(f"[{re.escape(SENTENCE_ENDS)}]")
+
+# bound method saves an attribute lookup on every call
+_ts_match = _TS_RE.match
+
+
+def add_seconds(t: int, seconds: float) -> int:
+    """Add a number of seconds to a time.
 
     Args:
-        t: The time object to add seconds to
+        t: The time in microseconds to add seconds to
         seconds: The number of seconds to add (can be negative)
 
     Returns:
-        A new time object with the seconds added
+        The new time in microseconds, wrapped around midnight
+    """
+    return (t + round(seconds * US_PER_SECOND)) % US_PER_DAY
+
+
+def time_to_us(t: time) -> int:
+    """Convert a time object to microseconds since midnight.
+
+    Args:
+        t: Time object to convert
+
+    Returns:
+        Total microseconds as integer
     """
-    dt = datetime.combine(datetime.today(), t)
-    dt_plus_sec = dt + timedelta(seconds=seconds)
-    return dt_plus_sec.time()
+    return (t.hour * 3600 + t.minute * 60 + t.second) * US_PER_SECOND + t.microsecond
+
+
+def format_timestamp(us: int) -> str:
+    """Format microseconds since midnight as a WebVTT timestamp.
+
+    Args:
+        us: Time in microseconds
+
+    Returns:
+        Timestamp in the format HH:MM:SS.mmm
+    """
+    seconds, us = divmod(us, US_PER_SECOND)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}.{us // 1000:03}"
 
 
 def str_to_time(text: str) -> time | None:
     """Convert a string to a time object.
 
+    Surrounding whitespace is ignored.
+
     Args:
         text: String in ISO format (HH:MM:SS)
 
     Returns:
         A time object if parsing succeeds, None otherwise
     """
+    # most lines are text, so avoid raising ValueError for those
+    if not _ts_match(text):
+        return None
     try:
-        return time.fromisoformat(text)
+        return time.fromisoformat(text.strip())
     except ValueError:
         return None
 
 
-def read_raw_data(filename: str) -> VttData:
+def read_raw_data(filename: str) -> Iterator[Subtitle]:
     """Read raw subtitle data from a file and convert to VTT format.
 
     The file should contain timestamps and text lines. Timestamps mark
@@ -45,57 +103,73 @@ def read_raw_data(filename: str) -> VttData:
     Args:
         file: Path to the input file
 
+    Yields:
+        Tuples containing (start_time, end_time, text)
+    """
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start_time = 0
+            # offset where the text of the current segment begins
+            text_start = 0
+            for match in _TS_LINE_RE.finditer(data):
+                the_time = str_to_time(match.group().decode("utf-8"))
+                if the_time is None:
+                    continue
+                text = data[text_start : match.start()]
+                text_start = match.end()
+                if not text:
+                    continue
+                the_us = time_to_us(the_time)
+                end_time = add_seconds(the_us, -0.5)
+                yield (start_time, end_time, join_lines(text.decode("utf-8")))
+                start_time = the_us
+            text = data[text_start:]
+            if text:
+                # TODO: should not always add 5 seconds
+                end_time = add_seconds(start_time, 5)
+                yield (start_time, end_time, join_lines(text.decode("utf-8")))
+
+
+def join_lines(text: str) -> str:
+    """Join the lines of a text into a single line of text.
+
+    All whitespace runs, including line ends, are collapsed into a single space.
+
+    Args:
+        text: Text lines to join
+
     Returns:
-        List of tuples containing (start_time, end_time, text)
+        The joined text without leading or trailing whitespace
     """
-    result = []
-    with open(filename, "r", encoding="utf-8") as file:
-        start_time = time(0, 0, 0, 0)
-        texts: list[str] = []
-        for line in file:
-            clean_line = line.strip()
-            the_time = str_to_time(clean_line)
-            if the_time is not None and len(texts) == 0:
-                continue
-            elif the_time is not None:
-                end_time = add_seconds(the_time, -0.5)
-                result.append((start_time, end_time, " ".join(texts)))
-                start_time = the_time
-                texts = []
-            else:
-                texts.append(clean_line)
-        if len(texts) != 0:
-            # TODO: should not always add 5 seconds
-            result.append((start_time, add_seconds(start_time, 5), " ".join(texts)))
-    return result
-
-
-def split_subtitles(vtt: VttData) -> VttData:
+    return " ".join(text.split())
+
+
+def split_subtitles(vtt: VttData) -> Iterator[Subtitle]:
     """Split long subtitles into smaller chunks.
 
     Subtitles longer than 120 characters are split into multiple subtitles.
 
     Args:
-        vtt: List of subtitle tuples
+        vtt: Subtitle tuples
 
-    Returns:
-        List of subtitle tuples with long subtitles split
+    Yields:
+        Subtitle tuples with long subtitles split
     """
-    output = []
     for s, e, t in vtt:
         if len(t) <= 60 * 2:
-            output.append((s, e, t))
+            yield (s, e, t)
         else:
-            output.extend(split_subtitle(s, e, t))
-    return output
+            yield from split_subtitle(s, e, t)
 
 
-def split_subtitle(start: time, end: time, text: str) -> VttData:
+def split_subtitle(start: int, end: int, text: str) -> list[Subtitle]:
     """Split a single long subtitle into multiple subtitles.
 
     Args:
-        start: Start time of the subtitle
-        end: End time of the subtitle
+        start: Start time of the subtitle in microseconds
+        end: End time of the subtitle in microseconds
         text: Text content to split
 
     Returns:
@@ -106,45 +180,30 @@ def split_subtitle(start: time, end: time, text: str) -> VttData:
     return [(s, e, line) for (line, (s, e)) in zip(lines, times)]
 
 
-def time_to_seconds(t: time) -> int:
-    """Convert a time object to total seconds.
-
-    Args:
-        t: Time object to convert
-
-    Returns:
-        Total seconds as integer
-    """
-    return t.hour * 3600 + t.minute * 60 + t.second
-
-
-def split_time(start: time, end: time, count: int) -> Iterator[tuple[time, time]]:
+def split_time(start: int, end: int, count: int) -> Iterator[tuple[int, int]]:
     """Split a time range into multiple segments.
 
     If possible each segment will have an duration of ten seconds
     (except for the last segment that will have all the remaining time).
     If the duration is too small for that each segment is given equal time.
+    An empty or backwards range (end not after start) is clamped so that
+    every segment starts and ends at start, never before it.
 
     Args:
-        start: Start time of the range
-        end: End time of the range
+        start: Start time of the range in microseconds
+        end: End time of the range in microseconds
         count: Number of segments to create
 
     Returns:
         List of (start_time, end_time) tuples for each segment
     """
-    start_seconds = time_to_seconds(start)
-    end_seconds = time_to_seconds(end)
-    total_duration = end_seconds - start_seconds
+    # the next timestamp can be less than half a second away, there is no
+    # time to split then and cues must not end before they start
+    end = max(end, start)
 
     # if too small, just split evenly
-    time_allotment = min(10, total_duration // count)
-    start_times = [
-        add_seconds(start, seconds) for seconds in range(0, end_seconds, time_allotment)
-    ]
-
-    # since we might have some overflow
-    start_times = start_times[:count]
+    time_allotment = min(10 * US_PER_SECOND, (end - start) // count)
+    start_times = [start + i * time_allotment for i in range(count)]
     end_times = start_times[1:]
     end_times.append(end)
 
@@ -164,101 +223,105 @@ def split_text_by_sentences(text: str, max_length: int = 120) -> list[str]:
     Returns:
         List of text chunks
     """
+    # find every sentence end once instead of searching each window
+    breaks = [m.start() for m in _SENT_RE.finditer(text)]
+    text_length = len(text)
     chunks = []
     start = 0
-    while start < len(text):
+    while start < text_length:
         # if the remaining text is short, take it all
-        if len(text) - start <= max_length:
+        if text_length - start <= max_length:
             chunks.append(text[start:].strip())
             break
         # try to find a sentence end within the next max_length chars
-        end = end_of_sentence_before(text, start + max_length + 1)
-        if end == -1 or end < start:
+        i = bisect_left(breaks, start + max_length + 1) - 1
+        if i < 0 or breaks[i] < start:
             end = start + max_length
             # avoid breaking in the middle of a word
             while end > start and text[end - 1] not in " \n":
                 end -= 1
         else:
-            end += 1
+            end = breaks[i] + 1
         chunks.append(text[start:end].strip())
         start = end
     return chunks
 
 
-def end_of_sentence_before(text: str, pos: int) -> int:
-    """Find the last sentence ending before a given position.
-
-    Args:
-        text: Text to search in
-        pos: Position to search backwards from
-
-    Returns:
-        Index of the last sentence ending character, or -1 if none found
-    """
-    for i in range(pos - 1, -1, -1):
-        if text[i] in ".?!,":
-            return i
-    return -1
-
-
-def split_into_lines(text: str) -> list[str]:
+@lru_cache(maxsize=4096)
+def split_into_lines(text: str) -> tuple[str, ...]:
     """Split text into lines with a maximum length of 60 characters.
 
     Breaks text at word boundaries to avoid splitting words across lines.
+    Results are cached since the same text is often repeated.
 
     Args:
         text: Text to split into lines
 
     Returns:
-        List of lines, each 60 characters or less
+        Tuple of lines, each 60 characters or less
     """
-    words = re.split(r"\s+", text)
-
     lines = []
-    current_line = ""
-
-    for word in words:
-        word = word.strip()
-        if not word:
-            continue
+    current_words: list[str] = []
+    current_length = 0
 
+    for word in text.split():
+        word_length = len(word)
         # if adding this word would exceed 60 characters, start a new line
-        if current_line and len(current_line + " " + word) > 60:
-            lines.append(current_line)
-            current_line = word
+        if current_words and current_length + 1 + word_length > 60:
+            lines.append(" ".join(current_words))
+            current_words = [word]
+            current_length = word_length
         # if current line is empty, start with this word
-        elif not current_line:
-            current_line = word
+        elif not current_words:
+            current_words.append(word)
+            current_length = word_length
         else:
-            current_line += " " + word
+            current_words.append(word)
+            current_length += 1 + word_length
 
-    if current_line:
-        lines.append(current_line)
+    if current_words:
+        lines.append(" ".join(current_words))
 
-    return lines
+    return tuple(lines)
 
 
 def output_vtt(data: VttData, filename: str) -> None:
     """Write subtitle data to a WebVTT format file.
 
+    The data is consumed lazily, so it is written to a temporary file that
+    only replaces the output once all of it has been read. A failure while
+    reading the input never leaves a partial file behind.
+
     Args:
-        data: List of subtitle tuples (start_time, end_time, text)
+        data: Subtitle tuples (start_time, end_time, text)
         filename: Output file path
     """
-    with open(filename, "w", encoding="utf-8") as file:
-        file.write("WEBVTT\n\n")
-        for s, e, t in data:
-            start = f"{s.hour:0>2}:{s.minute:0>2}:{s.second:0>2}.{s.microsecond // 1000:0<3}"
-            end = f"{e.hour:0>2}:{e.minute:0>2}:{e.second:0>2}.{e.microsecond // 1000:0<3}"
-
-            file.write(start)
-            file.write(" --> ")
-            file.write(end)
-            file.write("\n")
-            for line in split_into_lines(t):
-                file.write(line)
-                file.write("\n")
-            file.write("\n")
+    file = tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=os.path.dirname(filename) or ".",
+        prefix=os.path.basename(filename) + ".",
+        suffix=".tmp",
+        delete=False,
+    )
+    tmp_filename = file.name
+    try:
+        with file:
+            file.write("WEBVTT\n\n")
+            for s, e, t in data:
+                start = format_timestamp(s)
+                end = format_timestamp(e)
+
+                cue = [f"{start} --> {end}", *split_into_lines(t)]
+                file.write("\n".join(cue) + "\n\n")
+        # temporary files are private, give the output the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_filename, 0o666 & ~umask)
+    except BaseException:
+        os.remove(tmp_filename)
+        raise
+    os.replace(tmp_filename, filename)
 
 
 def main() -> None:
@@ -267,6 +330,7 @@ def main() -> None:
         exit(-1)
 
     filename = sys.argv[1]
+    # each stage is lazy so subtitles stream straight from input to output
     raw_data = read_raw_data(filename)
     fixed_data = split_subtitles(raw_data)
     output_vtt(fixed_data, filename + ".vtt")
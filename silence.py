@@ -1,18 +1,99 @@
-from pydub import AudioSegment
-from pydub.silence import detect_silence
+import subprocess
+import sys
+
+import numpy as np
+
+# silence detection only needs coarse energy, so a low rate is enough.
+# Resampling drops everything above 4 kHz (sibilants, hiss), so quiet
+# segments with mostly high-frequency sound may count as silent.
+SAMPLE_RATE = 8000
+# samples in one millisecond of audio
+FRAME_LEN = SAMPLE_RATE // 1000
+READ_SIZE = 1 << 20
+MAX_AMPLITUDE = 1 << 15
+
+
+def frame_energies(mp3_path: str) -> np.ndarray:
+    """Decode an audio file and compute the energy of every millisecond.
+
+    The audio is streamed from ffmpeg as mono 16-bit samples so that the
+    decoded file never has to be kept in memory.
+
+    Args:
+        mp3_path: Path to the audio file
+
+    Returns:
+        Sum of squared samples for each millisecond of audio
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", mp3_path,
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    frame_bytes = FRAME_LEN * 2
+    energies = []
+    pending = b""
+    with subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=READ_SIZE) as proc:
+        while chunk := proc.stdout.read(READ_SIZE):
+            data = pending + chunk
+            usable = len(data) - len(data) % frame_bytes
+            pending = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.int64)
+            energies.append((samples * samples).reshape(-1, FRAME_LEN).sum(axis=1))
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, command)
+
+    if not energies:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(energies)
 
-def detect_silent_segments(mp3_path: str, silence_thresh_db: int = -40, min_silence_len_ms: int = 500) -> None:
-    audio = AudioSegment.from_mp3(mp3_path)
 
-    silent_ranges = detect_silence(
-        audio,
-        min_silence_len=min_silence_len_ms,
-        silence_thresh=silence_thresh_db
+def find_silence(
+    energies: np.ndarray, silence_thresh_db: int, min_silence_len_ms: int
+) -> list[tuple[int, int]]:
+    """Find silent ranges given the energy of every millisecond.
+
+    Every window of min_silence_len_ms with an RMS below the threshold is
+    silent. Silent windows that overlap or touch are merged into one range,
+    the same rule pydub's detect_silence uses.
+
+    Args:
+        energies: Sum of squared samples for each millisecond
+        silence_thresh_db: Threshold in dBFS
+        min_silence_len_ms: Shortest silence to report
+
+    Returns:
+        List of (start_ms, end_ms) tuples
+    """
+    if len(energies) < min_silence_len_ms:
+        return []
+
+    cumulative = np.concatenate(([0], np.cumsum(energies)))
+    window = cumulative[min_silence_len_ms:] - cumulative[:-min_silence_len_ms]
+    # compare energies against the squared threshold to avoid square roots
+    thresh = 10 ** (silence_thresh_db / 20) * MAX_AMPLITUDE
+    silent_starts = np.flatnonzero(window <= thresh**2 * min_silence_len_ms * FRAME_LEN)
+    if silent_starts.size == 0:
+        return []
+
+    # a new range only starts when the next silent window begins after the
+    # previous one has ended, otherwise the windows are merged
+    breaks = np.flatnonzero(np.diff(silent_starts) > min_silence_len_ms)
+    starts = silent_starts[np.concatenate(([0], breaks + 1))]
+    ends = silent_starts[np.concatenate((breaks, [silent_starts.size - 1]))]
+    ends += min_silence_len_ms
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def detect_silent_segments(mp3_path: str, silence_thresh_db: int = -40, min_silence_len_ms: int = 500) -> None:
+    silent_ranges = find_silence(
+        frame_energies(mp3_path),
+        silence_thresh_db=silence_thresh_db,
+        min_silence_len_ms=min_silence_len_ms
     )
 
-    print("Silent segments (start, end) in seconds:")
-    for start_ms, end_ms in silent_ranges:
-        print(f"{start_ms / 1000:.2f} - {end_ms / 1000:.2f}")
+    lines = ["Silent segments (start, end) in seconds:"]
+    lines.extend(f"{start_ms / 1000:.2f} - {end_ms / 1000:.2f}" for start_ms, end_ms in silent_ranges)
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
     detect_silent_segments("audiotest.mp3")
@@ -0,0 +1,112 @@
+import pytest
+
+from main import US_PER_SECOND, format_timestamp, read_raw_data, split_time
+
+
+def read(tmp_path, content):
+    path = tmp_path / "input.txt"
+    path.write_bytes(content.encode("utf-8"))
+    return list(read_raw_data(str(path)))
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n", "\r"])
+def test_read_raw_data_splits_on_any_line_end(tmp_path, newline):
+    content = newline.join(["00:00:01", "Hello", "there", "00:00:05", "Second", ""])
+
+    assert read(tmp_path, content) == [
+        (0, 4_500_000, "Hello there"),
+        (5_000_000, 10_000_000, "Second"),
+    ]
+
+
+def test_read_raw_data_skips_timestamps_without_text(tmp_path):
+    content = "00:00:01\n00:00:02\nHello\n00:00:05\n00:00:06\nSecond\n"
+
+    # a timestamp without text before it is ignored
+    assert read(tmp_path, content) == [
+        (0, 4_500_000, "Hello"),
+        (5_000_000, 10_000_000, "Second"),
+    ]
+
+
+def test_read_raw_data_keeps_text_before_first_timestamp(tmp_path):
+    content = "Intro\n00:00:03\nHello\n"
+
+    assert read(tmp_path, content) == [
+        (0, 2_500_000, "Intro"),
+        (3_000_000, 8_000_000, "Hello"),
+    ]
+
+
+def test_read_raw_data_blank_lines_count_as_text(tmp_path):
+    content = "00:00:01\nHello\n\n00:00:05\n\n00:00:09\nEnd\n"
+
+    assert read(tmp_path, content) == [
+        (0, 4_500_000, "Hello"),
+        (5_000_000, 8_500_000, ""),
+        (9_000_000, 14_000_000, "End"),
+    ]
+
+
+@pytest.mark.parametrize("indent", [" ", "\t", "\xa0", "\u3000"])
+def test_read_raw_data_accepts_indented_timestamps(tmp_path, indent):
+    content = f"{indent}00:00:01\nHello\n{indent}00:00:05 \nSecond\n"
+
+    assert read(tmp_path, content) == [
+        (0, 4_500_000, "Hello"),
+        (5_000_000, 10_000_000, "Second"),
+    ]
+
+
+def test_read_raw_data_treats_invalid_timestamps_as_text(tmp_path):
+    content = "00:00:01\n12 apples\n99:99:99\n00:00:05\nSecond\n"
+
+    assert read(tmp_path, content) == [
+        (0, 4_500_000, "12 apples 99:99:99"),
+        (5_000_000, 10_000_000, "Second"),
+    ]
+
+
+def test_read_raw_data_empty_file(tmp_path):
+    assert read(tmp_path, "") == []
+
+
+def test_split_time_splits_short_ranges_evenly():
+    times = list(split_time(0, 5 * US_PER_SECOND, 4))
+
+    assert times == [
+        (0, 1_250_000),
+        (1_250_000, 2_500_000),
+        (2_500_000, 3_750_000),
+        (3_750_000, 5_000_000),
+    ]
+
+
+def test_split_time_caps_segments_at_ten_seconds():
+    times = list(split_time(0, 100 * US_PER_SECOND, 3))
+
+    assert times == [
+        (0, 10 * US_PER_SECOND),
+        (10 * US_PER_SECOND, 20 * US_PER_SECOND),
+        (20 * US_PER_SECOND, 100 * US_PER_SECOND),
+    ]
+
+
+def test_split_time_never_ends_before_start():
+    times = list(split_time(7 * US_PER_SECOND, 6 * US_PER_SECOND, 3))
+
+    assert times == [(7 * US_PER_SECOND, 7 * US_PER_SECOND)] * 3
+
+
+@pytest.mark.parametrize(
+    "us, expected",
+    [
+        (0, "00:00:00.000"),
+        (5_000, "00:00:00.005"),
+        (50_000, "00:00:00.050"),
+        (500_000, "00:00:00.500"),
+        (3_723_004_999, "01:02:03.004"),
+    ],
+)
+def test_format_timestamp_zero_pads_every_field(us, expected):
+    assert format_timestamp(us) == expected
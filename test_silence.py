@@ -0,0 +1,24 @@
+import numpy as np
+
+from silence import FRAME_LEN, MAX_AMPLITUDE, find_silence
+
+# energy limit of a silent 500 ms window at -40 dBFS
+WINDOW_LIMIT = (MAX_AMPLITUDE / 100) ** 2 * 500 * FRAME_LEN
+
+
+def test_find_silence_merges_nearby_silent_windows():
+    energies = np.full(1200, 10**12, dtype=np.int64)
+    energies[:610] = 0
+    # each blip alone keeps a window silent, windows 11-99 hold both
+    energies[99] = energies[510] = int(WINDOW_LIMIT * 0.75)
+
+    # silent windows start at 0-10 and 100-110
+    assert find_silence(energies, -40, 500) == [(0, 610)]
+
+
+def test_find_silence_separates_distant_silences():
+    energies = np.full(2000, 10**12, dtype=np.int64)
+    energies[0:500] = 0
+    energies[1200:1700] = 0
+
+    assert find_silence(energies, -40, 500) == [(0, 500), (1200, 1700)]